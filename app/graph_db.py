@@ -1,183 +1,396 @@
 import sqlite3
-from typing import Literal, Optional
+from collections import defaultdict
+from typing import Literal, Optional, get_args
 
 RelationshipType = Literal["Parent", "Sibling", "Partner"]
+RELATIONSHIP_TYPES = frozenset(get_args(RelationshipType))
+
+# Relationship types stored with person_a/person_b in canonical (ascending id) order
+SYMMETRIC_TYPES = frozenset({"Sibling", "Partner"})
+
+# SQLite's default limit on bound parameters per statement
+SQLITE_MAX_VARIABLES = 999
+
+
+# Statements used on every call; the {placeholders} and {values} templates are
+# filled with "?, ?, ..." / "(?, ?), (?, ?), ..." sized to the chunk at hand
+_SQL_INSERT_PERSON = "INSERT OR IGNORE INTO people (name) VALUES (?)"
+_SQL_PERSON_IDS = "SELECT id, name FROM people WHERE name IN ({placeholders})"
+_SQL_DELETE_PERSON = "DELETE FROM people WHERE id = ?"
+_SQL_INSERT_REL = "INSERT OR IGNORE INTO relationships (type, person_a, person_b) VALUES (?, ?, ?)"
+# Joining the VALUES list against relationships lets SQLite seek the full
+# UNIQUE key for each row; a plain "(a, b, c) IN (VALUES ...)" only seeks on type
+_SQL_DELETE_REL = (
+    "DELETE FROM relationships WHERE id IN ("
+    "SELECT r.id FROM (VALUES {values}) v JOIN relationships r"
+    " ON r.type = v.column1 AND r.person_a = v.column2 AND r.person_b = v.column3)"
+)
+_SQL_DELETE_REL_ANY = (
+    "DELETE FROM relationships WHERE id IN ("
+    "SELECT r.id FROM (VALUES {values}) v JOIN relationships r"
+    " ON r.person_a = v.column1 AND r.person_b = v.column2)"
+)
+_SQL_LOAD_PEOPLE = "SELECT id, name FROM people"
+_SQL_LOAD_PARENT_EDGES = "SELECT person_a, person_b FROM relationships WHERE type = 'Parent'"
+_SQL_LOAD_SYMMETRIC_EDGES = "SELECT type, person_a, person_b FROM relationships WHERE type IN ({placeholders})"
+
+def _chunked(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
 
 class FamilyTree:
+    __slots__ = (
+        "db_path", "conn", "cursor", "_execute", "_executemany", "_name_to_id",
+        "_parents", "_children", "_siblings", "_partners", "_symmetric", "_adjacency",
+    )
+
     def __init__(self, db_path: str):
         self.db_path = db_path
         self.conn = None
         self.cursor = None
+        self._execute = None
+        self._executemany = None
+        # Person names are stored once in people; every other table refers to
+        # them by integer id. This mirrors the people table for the session.
+        self._name_to_id: dict[str, int] = {}
+        # In-memory mirror of the relationships table, person -> neighbors;
+        # reads are served from here, writes go to SQLite and then here
+        self._parents: defaultdict[str, set[str]] = defaultdict(set)
+        self._children: defaultdict[str, set[str]] = defaultdict(set)
+        self._siblings: defaultdict[str, set[str]] = defaultdict(set)
+        self._partners: defaultdict[str, set[str]] = defaultdict(set)
+        self._symmetric = {"Sibling": self._siblings, "Partner": self._partners}
+        self._adjacency = (self._parents, self._children, self._siblings, self._partners)
 
     def __enter__(self):
-        self.conn = sqlite3.connect(self.db_path)
+        # isolation_level=None: we manage the transaction explicitly below
+        self.conn = sqlite3.connect(self.db_path, isolation_level=None)
         self.cursor = self.conn.cursor()
-        self._create_schema()
+        # Bound once per session for the per-call statements
+        self._execute = self.cursor.execute
+        self._executemany = self.cursor.executemany
+        try:
+            # Pragmas must run outside a transaction to take effect
+            self.cursor.execute("PRAGMA journal_mode = WAL")
+            self.cursor.execute("PRAGMA synchronous = NORMAL")
+            self.cursor.execute("PRAGMA temp_store = MEMORY")
+            self.cursor.execute("PRAGMA foreign_keys = ON")
+            # One write transaction for the whole session
+            self.cursor.execute("BEGIN IMMEDIATE")
+            self._create_schema()
+            self._load_graph()
+        except BaseException:
+            # __exit__ isn't called when __enter__ raises; release the lock here
+            if self.conn.in_transaction:
+                self.cursor.execute("ROLLBACK")
+            self.conn.close()
+            self.conn = None
+            raise
         return self
 
     def __exit__(self, exc_type, exc, tb):
         if self.conn:
-            if exc_type is None:
-                self.conn.commit()
-            self.conn.close()
+            try:
+                if exc_type is None:
+                    self.cursor.execute("COMMIT")
+                elif self.conn.in_transaction:
+                    self.cursor.execute("ROLLBACK")
+            finally:
+                self.conn.close()
+                self.conn = None
 
     # schema
     def _create_schema(self):
+        # Databases written before people had an integer id
+        self.cursor.execute("PRAGMA table_info(people)")
+        columns = {row[1] for row in self.cursor}
+        text_keyed = bool(columns) and "id" not in columns
+        if text_keyed:
+            self._check_text_keyed_types()
+            self._stash_text_keyed_tables()
+
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS people (
-                name TEXT PRIMARY KEY
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE NOT NULL
             );
         """)
-        self.cursor.execute("""
+        # Symmetric edges are stored once, smaller id first
+        symmetric_types = ", ".join(f"'{t}'" for t in sorted(SYMMETRIC_TYPES))
+        self.cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS relationships (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id INTEGER PRIMARY KEY,
                 type TEXT NOT NULL,
-                person_a TEXT NOT NULL,
-                person_b TEXT NOT NULL,
-                FOREIGN KEY(person_a) REFERENCES people(name) ON DELETE CASCADE,
-                FOREIGN KEY(person_b) REFERENCES people(name) ON DELETE CASCADE,
-                UNIQUE(type, person_a, person_b)
+                person_a INTEGER NOT NULL,
+                person_b INTEGER NOT NULL,
+                FOREIGN KEY(person_a) REFERENCES people(id) ON DELETE CASCADE,
+                FOREIGN KEY(person_b) REFERENCES people(id) ON DELETE CASCADE,
+                UNIQUE(type, person_a, person_b),
+                CHECK (type NOT IN ({symmetric_types}) OR person_a < person_b)
             );
         """)
+        # Lookups on either side regardless of type (pruning, cascades)
+        self.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_rel_person_a ON relationships (person_a);
+        """)
+        self.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_rel_person_b ON relationships (person_b);
+        """)
+        # Reads are served from the in-memory mirror, so the reverse-direction
+        # table and the by-person_b index only cost writes; drop them if present
+        self.cursor.execute("DROP TABLE IF EXISTS symmetric_neighbors")
+        self.cursor.execute("DROP INDEX IF EXISTS idx_rel_type_b")
 
-    # internal helpers
-    def _ensure_person_exists(self, name: str):
-        self.cursor.execute("SELECT 1 FROM people WHERE name = ?", (name,))
-        if not self.cursor.fetchone():
-            self.cursor.execute("INSERT INTO people (name) VALUES (?)", (name,))
+        if text_keyed:
+            self._migrate_text_keyed_tables()
+
+    def _check_text_keyed_types(self):
+        # Refuse to migrate rather than lose edges the current API can't represent;
+        # raising here rolls back the session before anything is touched
+        types = ", ".join("?" * len(RELATIONSHIP_TYPES))
+        self.cursor.execute(f"""
+            SELECT DISTINCT type FROM relationships WHERE type NOT IN ({types}) ORDER BY type
+        """, tuple(RELATIONSHIP_TYPES))
+        unknown = [row[0] for row in self.cursor]
+        if unknown:
+            raise ValueError(
+                f"Can't migrate '{self.db_path}': unknown relationship types "
+                f"{', '.join(repr(t) for t in unknown)} (expected one of {', '.join(sorted(RELATIONSHIP_TYPES))})."
+            )
 
-    def _delete_person_if_lonely(self, name: str):
+    def _stash_text_keyed_tables(self):
+        # Move the old tables aside so the current schema can be created.
+        # Their indexes move with them, so drop those to free the names.
+        self.cursor.execute("ALTER TABLE people RENAME TO legacy_people")
+        self.cursor.execute("ALTER TABLE relationships RENAME TO legacy_relationships")
+        for index in ("idx_rel_type_b", "idx_rel_person_a", "idx_rel_person_b"):
+            self.cursor.execute(f"DROP INDEX IF EXISTS {index}")
+
+    def _migrate_text_keyed_tables(self):
+        # Foreign keys weren't enforced before, so an edge may name someone
+        # missing from people; recreate them rather than drop the edge
         self.cursor.execute("""
-            SELECT 1 FROM relationships
-            WHERE person_a = ? OR person_b = ?
-        """, (name, name))
-        if not self.cursor.fetchone():
-            self.cursor.execute("DELETE FROM people WHERE name = ?", (name,))
+            INSERT INTO people (name)
+            SELECT name FROM legacy_people
+            UNION SELECT person_a FROM legacy_relationships
+            UNION SELECT person_b FROM legacy_relationships
+        """)
+        # Plain INSERT (not OR IGNORE) so a row that violates a constraint
+        # aborts the migration instead of being skipped
+        symmetric = ", ".join("?" * len(SYMMETRIC_TYPES))
+        self.cursor.execute(f"""
+            INSERT INTO relationships (type, person_a, person_b)
+            SELECT DISTINCT r.type,
+                   CASE WHEN r.type IN ({symmetric}) THEN min(a.id, b.id) ELSE a.id END,
+                   CASE WHEN r.type IN ({symmetric}) THEN max(a.id, b.id) ELSE b.id END
+            FROM legacy_relationships r
+            JOIN people a ON a.name = r.person_a
+            JOIN people b ON b.name = r.person_b
+        """, (*SYMMETRIC_TYPES, *SYMMETRIC_TYPES))
+        self.cursor.execute("DROP TABLE legacy_relationships")
+        self.cursor.execute("DROP TABLE legacy_people")
+
+    # internal helpers
+    @staticmethod
+    def _as_set(x) -> set[str]:
+        # Sets are passed through without copying, so never mutate the result
+        return x if type(x) is set else ({x} if isinstance(x, str) else set(x))
+
+    def _delete_lonely_people(self, names: set[str]):
+        # The mirror holds every relationship, so no need to ask SQLite
+        self._remove_people(*(
+            name for name in names
+            if not any(name in adjacency for adjacency in self._adjacency)
+        ))
+
+    def _delete_rows(self, sql: str, rows: list[tuple]):
+        # sql is one of the _SQL_DELETE_REL* templates matching on a VALUES list
+        if not rows:
+            return
+        width = len(rows[0])
+        row_placeholders = "(" + ", ".join("?" * width) + ")"
+        execute = self._execute
+        for chunk in _chunked(rows, SQLITE_MAX_VARIABLES // width):
+            values = ", ".join([row_placeholders] * len(chunk))
+            execute(sql.format(values=values), [v for row in chunk for v in row])
+
+    def _load_graph(self):
+        for adjacency in self._adjacency:
+            adjacency.clear()
+        self._execute(_SQL_LOAD_PEOPLE)
+        id_to_name = dict(self.cursor)
+        self._name_to_id = {name: id for id, name in id_to_name.items()}
+        self._execute(_SQL_LOAD_PARENT_EDGES)
+        for parent, child in self.cursor:
+            parent, child = id_to_name[parent], id_to_name[child]
+            self._children[parent].add(child)
+            self._parents[child].add(parent)
+        self._execute(
+            _SQL_LOAD_SYMMETRIC_EDGES.format(placeholders=", ".join("?" * len(SYMMETRIC_TYPES))),
+            tuple(SYMMETRIC_TYPES),
+        )
+        for type, a, b in self.cursor:
+            a, b = id_to_name[a], id_to_name[b]
+            adjacency = self._symmetric[type]
+            adjacency[a].add(b)
+            adjacency[b].add(a)
+
+    @staticmethod
+    def _unlink(adjacency: defaultdict, person: str, neighbor: str):
+        neighbors = adjacency.get(person)
+        if neighbors:
+            neighbors.discard(neighbor)
+            if not neighbors:
+                del adjacency[person]
 
     def _add_people(self, *names: str):
-        for name in names:
-            self._ensure_person_exists(name)
+        new_names = [name for name in names if name not in self._name_to_id]
+        if not new_names:
+            return
+        self._executemany(_SQL_INSERT_PERSON, [(name,) for name in new_names])
+        for chunk in _chunked(new_names, SQLITE_MAX_VARIABLES):
+            self._execute(_SQL_PERSON_IDS.format(placeholders=", ".join("?" * len(chunk))), chunk)
+            for id, name in self.cursor:
+                self._name_to_id[name] = id
 
     def _remove_people(self, *names: str):
+        names = [name for name in names if name in self._name_to_id]
+        self._executemany(_SQL_DELETE_PERSON, [(self._name_to_id.pop(name),) for name in names])
+        # Mirror the ON DELETE CASCADE
+        unlink, parents, children = self._unlink, self._parents, self._children
         for name in names:
-            self.cursor.execute("DELETE FROM people WHERE name = ?", (name,))
+            for parent in parents.pop(name, ()):
+                unlink(children, parent, name)
+            for child in children.pop(name, ()):
+                unlink(parents, child, name)
+            for adjacency in self._symmetric.values():
+                for neighbor in adjacency.pop(name, ()):
+                    unlink(adjacency, neighbor, name)
 
     # public relationship API
     def add_relationship(self, type: RelationshipType, a, b):
+        if type not in RELATIONSHIP_TYPES:
+            raise ValueError(f"Unknown relationship type '{type}'.")
+
         # Normalize inputs: strings → singleton sets, iterables → sets
-        set_a = {a} if isinstance(a, str) else set(a)
-        set_b = {b} if isinstance(b, str) else set(b)
+        set_a = self._as_set(a)
+        set_b = self._as_set(b)
+
+        # Reject self-relationships before anything is written
+        overlap = set_a & set_b
+        if overlap:
+            raise ValueError(f"Person '{min(overlap)}' can't have a relationship with themselves.")
 
         # Ensure all people exist
-        for person in set_a | set_b:
-            self._ensure_person_exists(person)
+        self._add_people(*(set_a | set_b))
+        ids = self._name_to_id
 
-        # Cartesian product insertion
+        symmetric = type in SYMMETRIC_TYPES
+        ids_b = [ids[pb] for pb in set_b]
+        edge_rows = []
+        append = edge_rows.append
         for pa in set_a:
-            for pb in set_b:
-                if pa == pb:
-                    raise ValueError(f"Person '{pa}' can't have a relationship with themselves.")
-                if type in ("Sibling", "Partner"):
-                    person1, person2 = sorted([pa, pb])
+            ia = ids[pa]
+            for ib in ids_b:
+                if symmetric:
+                    person1, person2 = (ia, ib) if ia < ib else (ib, ia)
                 else:
-                    person1, person2 = pa, pb
+                    person1, person2 = ia, ib
+                append((type, person1, person2))
+        if not edge_rows:
+            # An empty side adds people but no edges; keep them out of the mirror
+            return
 
-                self.cursor.execute("""
-                    INSERT OR IGNORE INTO relationships (type, person_a, person_b)
-                    VALUES (?, ?, ?)
-                """, (type, person1, person2))
+        # Cartesian product insertion
+        self._executemany(_SQL_INSERT_REL, edge_rows)
+
+        # Keep the in-memory mirror in step
+        if symmetric:
+            adjacency = self._symmetric[type]
+            for pa in set_a:
+                adjacency[pa] |= set_b
+            for pb in set_b:
+                adjacency[pb] |= set_a
+        else:
+            for pa in set_a:
+                self._children[pa] |= set_b
+            for pb in set_b:
+                self._parents[pb] |= set_a
 
     def remove_relationship(self, a, b, type: Optional[RelationshipType] = None):
+        if type is not None and type not in RELATIONSHIP_TYPES:
+            raise ValueError(f"Unknown relationship type '{type}'.")
+
         # Normalize inputs
-        set_a = {a} if isinstance(a, str) else set(a)
-        set_b = {b} if isinstance(b, str) else set(b)
+        set_a = self._as_set(a)
+        set_b = self._as_set(b)
 
-        for pa in set_a:
-            for pb in set_b:
-                if pa == pb:
-                    raise ValueError(f"Cannot remove a relationship of a person '{pa}' with themselves.")
-                if type in ("Sibling", "Partner"):
-                    person1, person2 = sorted([pa, pb])
-                else:
-                    person1, person2 = pa, pb
+        overlap = set_a & set_b
+        if overlap:
+            raise ValueError(f"Cannot remove a relationship of a person '{min(overlap)}' with themselves.")
+        if not set_a or not set_b:
+            # No pairs, so nobody to prune either
+            return
+
+        # People without an id have no relationships to remove
+        ids = self._name_to_id
+        known_a = [ids[pa] for pa in set_a if pa in ids]
+        known_b = [ids[pb] for pb in set_b if pb in ids]
 
-                if type:
-                    self.cursor.execute("""
-                        DELETE FROM relationships
-                        WHERE type = ? AND person_a = ? AND person_b = ?
-                    """, (type, person1, person2))
+        symmetric = type in SYMMETRIC_TYPES
+        pairs = []
+        append = pairs.append
+        for ia in known_a:
+            for ib in known_b:
+                if symmetric:
+                    person1, person2 = (ia, ib) if ia < ib else (ib, ia)
                 else:
-                    # delete all relationship types between these two
-                    self.cursor.execute("""
-                        DELETE FROM relationships
-                        WHERE (person_a = ? AND person_b = ?) OR (person_a = ? AND person_b = ?)
-                    """, (person1, person2, person2, person1))
+                    person1, person2 = ia, ib
+                append((person1, person2))
 
-                # Prune lonely nodes
-                self._delete_person_if_lonely(pa)
-                self._delete_person_if_lonely(pb)
+        if type:
+            self._delete_rows(_SQL_DELETE_REL, [(type, p1, p2) for p1, p2 in pairs])
+        else:
+            # delete all relationship types between these two, in either direction
+            both_directions = [row for p1, p2 in pairs for row in ((p1, p2), (p2, p1))]
+            self._delete_rows(_SQL_DELETE_REL_ANY, both_directions)
+
+        # Keep the in-memory mirror in step
+        directions = [(pa, pb) for pa in set_a for pb in set_b]
+        if type is None:
+            directions += [(pb, pa) for pa, pb in directions]
+        unlink, parents, children = self._unlink, self._parents, self._children
+        for p1, p2 in directions:
+            if type in (None, "Parent"):
+                unlink(children, p1, p2)
+                unlink(parents, p2, p1)
+            for adjacency_type, adjacency in self._symmetric.items():
+                if type in (None, adjacency_type):
+                    unlink(adjacency, p1, p2)
+                    unlink(adjacency, p2, p1)
+
+        # Prune lonely nodes
+        self._delete_lonely_people(set_a | set_b)
 
     # query helpers
+    @staticmethod
+    def _lookup(adjacency: defaultdict, people: set[str]) -> dict[str, set[str]]:
+        # .get() so that querying unknown people doesn't grow the mirror
+        return {p: set(adjacency.get(p, ())) for p in people}
+
     def parents_of(self, person: str | set[str]) -> dict[str, set[str]]:
-        set_people = {person} if isinstance(person, str) else set(person)
-        relationship_mapping: dict[str, set[str]] = {}
-        for person in set_people:
-            self.cursor.execute("""
-                SELECT person_a FROM relationships
-                WHERE type = 'Parent' AND person_b = ?
-            """, (person,))
-            relationship_mapping[person] = {row[0] for row in self.cursor.fetchall()}
-        return relationship_mapping
+        set_people = self._as_set(person)
+        return self._lookup(self._parents, set_people)
 
     def children_of(self, person: str | set[str]) -> dict[str, set[str]]:
-        set_people = {person} if isinstance(person, str) else set(person)
-        relationship_mapping: dict[str, set[str]] = {}
-        for person in set_people:
-            self.cursor.execute("""
-                SELECT person_b FROM relationships
-                WHERE type = 'Parent' AND person_a = ?
-            """, (person,))
-            relationship_mapping[person] = {row[0] for row in self.cursor.fetchall()}
-        return relationship_mapping
+        set_people = self._as_set(person)
+        return self._lookup(self._children, set_people)
 
     def siblings_of(self, person: str | set[str]) -> dict[str, set[str]]:
-        set_people = {person} if isinstance(person, str) else set(person)
-        relationship_mapping: dict[str, set[str]] = {}
-
-        for p in set_people:
-            self.cursor.execute("""
-                SELECT person_a, person_b
-                FROM relationships
-                WHERE type = 'Sibling' AND (person_a = ? OR person_b = ?)
-            """, (p, p))
-
-            rows = self.cursor.fetchall()
-            result = set()
-
-            for a, b in rows:
-                result.add(b if a == p else a)
-
-            relationship_mapping[p] = result
-
-        return relationship_mapping
+        set_people = self._as_set(person)
+        return self._lookup(self._siblings, set_people)
 
     def partner_of(self, person: str | set[str]) -> dict[str, set[str]]:
-        set_people = {person} if isinstance(person, str) else set(person)
-        relationship_mapping: dict[str, set[str]] = {}
-
-        for p in set_people:
-            self.cursor.execute("""
-                SELECT person_a, person_b
-                FROM relationships
-                WHERE type = 'Partner' AND (person_a = ? OR person_b = ?)
-            """, (p, p))
-
-            rows = self.cursor.fetchall()
-            result = set()
-
-            for a, b in rows:
-                result.add(b if a == p else a)
-
-            relationship_mapping[p] = result
-
-        return relationship_mapping
+        set_people = self._as_set(person)
+        return self._lookup(self._partners, set_people)
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from graph_db import FamilyTree
+
+# Schema as written by the original text-keyed graph_db.py
+BASELINE_SCHEMA = """
+    CREATE TABLE people (
+        name TEXT PRIMARY KEY
+    );
+    CREATE TABLE relationships (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT NOT NULL,
+        person_a TEXT NOT NULL,
+        person_b TEXT NOT NULL,
+        FOREIGN KEY(person_a) REFERENCES people(name) ON DELETE CASCADE,
+        FOREIGN KEY(person_b) REFERENCES people(name) ON DELETE CASCADE,
+        UNIQUE(type, person_a, person_b)
+    );
+"""
+
+
+class TextKeyedMigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "family.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write_baseline(self, people, edges):
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(BASELINE_SCHEMA)
+        conn.executemany("INSERT INTO people (name) VALUES (?)", [(p,) for p in people])
+        conn.executemany(
+            "INSERT INTO relationships (type, person_a, person_b) VALUES (?, ?, ?)", edges
+        )
+        conn.commit()
+        conn.close()
+
+    def test_relationships_survive_migration(self):
+        self._write_baseline(
+            ["Alice", "Bob", "Charlie", "David"],
+            [
+                ("Parent", "Alice", "Bob"),
+                ("Parent", "David", "Charlie"),
+                # baseline canonicalized symmetric pairs by name
+                ("Sibling", "Bob", "Charlie"),
+                ("Partner", "Alice", "David"),
+                # foreign keys weren't enforced, so Zoe has no people row
+                ("Parent", "Zoe", "Alice"),
+            ],
+        )
+
+        # Twice: the second open must see the already-migrated schema
+        for _ in range(2):
+            with FamilyTree(self.db_path) as tree:
+                self.assertEqual(tree.parents_of({"Bob", "Alice"}), {"Bob": {"Alice"}, "Alice": {"Zoe"}})
+                self.assertEqual(tree.children_of("David"), {"David": {"Charlie"}})
+                self.assertEqual(tree.siblings_of({"Bob", "Charlie"}), {"Bob": {"Charlie"}, "Charlie": {"Bob"}})
+                self.assertEqual(tree.partner_of("David"), {"David": {"Alice"}})
+
+        conn = sqlite3.connect(self.db_path)
+        names = {row[0] for row in conn.execute("SELECT name FROM people")}
+        self.assertEqual(names, {"Alice", "Bob", "Charlie", "David", "Zoe"})
+        self.assertEqual(conn.execute("SELECT count(*) FROM relationships").fetchone(), (5,))
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertNotIn("legacy_people", tables)
+        self.assertNotIn("legacy_relationships", tables)
+        self.assertEqual(conn.execute("PRAGMA foreign_key_check").fetchall(), [])
+        self.assertEqual(conn.execute("PRAGMA integrity_check").fetchone(), ("ok",))
+        conn.close()
+
+    def test_unknown_types_abort_and_keep_the_old_data(self):
+        self._write_baseline(
+            ["David", "Eve"],
+            [("Spouse", "David", "Eve"), ("Sibling", "David", "Eve")],
+        )
+
+        with self.assertRaisesRegex(ValueError, "'Spouse'"):
+            with FamilyTree(self.db_path):
+                pass
+
+        # Rolled back and closed: the old tables and rows are intact and unlocked
+        conn = sqlite3.connect(self.db_path, timeout=0)
+        conn.execute("BEGIN IMMEDIATE")
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(people)")}
+        self.assertEqual(columns, {"name"})
+        rows = set(conn.execute("SELECT type, person_a, person_b FROM relationships"))
+        self.assertEqual(rows, {("Spouse", "David", "Eve"), ("Sibling", "David", "Eve")})
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()